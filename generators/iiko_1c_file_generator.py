@@ -1,10 +1,7 @@
 # generators/iiko_1c_file_generator.py
 
-from typing import List
-from datetime import datetime
-from onik.project.models.transaction import Transaction
-
-from typing import List
+import heapq
+from typing import Iterable, List, Optional, TextIO, Tuple
 from datetime import datetime
 from onik.project.models.transaction import Transaction
 
@@ -15,80 +12,157 @@ class Iiko1CFileGenerator:
 
     Для каждой транзакции формируется отдельный блок,
     заканчивается "КонецДокумента".
+
+    Несколько выписок (любое количество банков) объединяются
+    через `write_merged_file` в один файл с одной шапкой и "КонецФайла".
     """
 
-    def generate_file_content(self, transactions: List[Transaction]) -> str:
+    def generate_file_content(
+        self,
+        transactions: List[Transaction],
+        now: Optional[datetime] = None
+    ) -> str:
+        """
+        `now` - момент формирования файла (по умолчанию текущий),
+        задаётся явно, когда нужен воспроизводимый результат.
+        """
         blocks = []
-        now_date = datetime.now().strftime('%d.%m.%Y')
-        now_time = datetime.now().strftime('%H:%M:%S')
+        now = now or datetime.now()
 
         for t in transactions:
-            block_lines = []
-
-            # Заголовок файла (по требованиям 1C/iiko)
-            block_lines.append("1CClientBankExchange")
-            block_lines.append("ВерсияФормата=1.01")
-            block_lines.append("Кодировка=Windows")
-            block_lines.append("Отправитель=Python Script")
-            block_lines.append("Получатель=")
-            block_lines.append(f"ДатаСоздания={now_date}")
-            block_lines.append(f"ВремяСоздания={now_time}")
-            block_lines.append(f"ДатаНачала={now_date}")
-            block_lines.append(f"ДатаКонца={now_date}")
-            block_lines.append(f"РасчСчет={t.payer_account or ''}")
-
-            # Начало документа
-            block_lines.append("Документ=Платежное поручение")
-            block_lines.append("СекцияДокумент=Платежное поручение")
-
-            block_lines.append(f"Номер={t.number}")
-            block_lines.append(f"Дата={t.date.strftime('%d.%m.%Y')}")
-
-            # Сумма всегда положительная для iiko
-            block_lines.append(f"Сумма={abs(t.amount):.2f}")
-
-            # --- Плательщик ---
-            if t.payer_inn:
-                block_lines.append(f"ПлательщикИНН={t.payer_inn}")
-            else:
-                block_lines.append("ПлательщикИНН=")
-            block_lines.append(f"Плательщик1={t.payer_name or ''}")
-
-            if t.payer_account:
-                block_lines.append(f"ПлательщикРасчСчет={t.payer_account}")
-            else:
-                block_lines.append("ПлательщикРасчСчет=")
-
-            # --- Получатель ---
-            if t.recipient_inn:
-                block_lines.append(f"ПолучательИНН={t.recipient_inn}")
-            else:
-                block_lines.append("ПолучательИНН=")
-            block_lines.append(f"Получатель1={t.recipient_name or ''}")
-
-            if t.recipient_account:
-                block_lines.append(f"ПолучательРасчСчет={t.recipient_account}")
-            else:
-                block_lines.append("ПолучательРасчСчет=")
-
-            # Назначение
-            block_lines.append(f"НазначениеПлатежа={t.payment_details}")
-            block_lines.append(f"НазначениеПлатежа1={t.payment_details}")
-
-            # Даты поступления/списания
-            if t.date_income:
-                block_lines.append(f"ДатаПоступило={t.date_income.strftime('%d.%m.%Y')}")
-            else:
-                block_lines.append("ДатаПоступило=")
-
-            if t.date_outcome:
-                block_lines.append(f"ДатаСписано={t.date_outcome.strftime('%d.%m.%Y')}")
-            else:
-                block_lines.append("ДатаСписано=")
-
-            block_lines.append("КонецДокумента")
+            block_lines = self._header_lines(now, [t.payer_account or ''])
+            block_lines.extend(self._document_lines(t))
             blocks.append("\n".join(block_lines))
 
         final_text = "\n".join(blocks)
         return final_text
 
+    def write_merged_file(
+        self,
+        streams: Iterable[Tuple[str, Iterable[Transaction]]],
+        output: TextIO,
+        now: Optional[datetime] = None
+    ) -> int:
+        """
+        Сливает любое количество выписок в один файл. `streams` - пары
+        (наш счёт из шапки выписки, поток её транзакций):
+          1) Одна шапка, РасчСчет - счёт каждой выписки, даже без операций.
+          2) Документы в порядке дат (k-way merge через кучу).
+          3) Один "КонецФайла" в конце.
+        Каждый поток должен быть уже упорядочен по дате (иначе ValueError),
+        потоки читаются лениво. В памяти держится по одной транзакции
+        на поток, документы сразу пишутся в `output`.
+        Возвращает количество записанных документов.
+        """
+        now = now or datetime.now()
+
+        # Берём первую транзакцию каждого потока для кучи
+        heap = []
+        accounts: List[str] = []
+        for index, (account, stream) in enumerate(streams):
+            if account and account not in accounts:
+                accounts.append(account)
+            iterator = iter(stream)
+            first = next(iterator, None)
+            if first is not None:
+                heap.append((first.date, index, first, iterator))
+        heapq.heapify(heap)
+
+        output.write("\n".join(self._header_lines(now, accounts)) + "\n")
+
+        count = 0
+        while heap:
+            _, index, t, iterator = heap[0]
+            output.write("\n".join(self._document_lines(t)) + "\n")
+            count += 1
+
+            following = next(iterator, None)
+            if following is None:
+                heapq.heappop(heap)
+            elif following.date < t.date:
+                raise ValueError(
+                    f"Поток {index} не упорядочен по дате: "
+                    f"{following.date:%d.%m.%Y} после {t.date:%d.%m.%Y}"
+                )
+            else:
+                heapq.heapreplace(heap, (following.date, index, following, iterator))
+
+        output.write("КонецФайла")
+        return count
+
+    # ---------------- Вспомогательные методы ----------------
+
+    def _header_lines(self, now: datetime, accounts: List[str]) -> List[str]:
+        now_date = now.strftime('%d.%m.%Y')
+        now_time = now.strftime('%H:%M:%S')
+
+        # Заголовок файла (по требованиям 1C/iiko)
+        header_lines = [
+            "1CClientBankExchange",
+            "ВерсияФормата=1.01",
+            "Кодировка=Windows",
+            "Отправитель=Python Script",
+            "Получатель=",
+            f"ДатаСоздания={now_date}",
+            f"ВремяСоздания={now_time}",
+            f"ДатаНачала={now_date}",
+            f"ДатаКонца={now_date}",
+        ]
+        for account in accounts:
+            header_lines.append(f"РасчСчет={account}")
+        return header_lines
+
+    def _document_lines(self, t: Transaction) -> List[str]:
+        block_lines = []
+
+        # Начало документа
+        block_lines.append("Документ=Платежное поручение")
+        block_lines.append("СекцияДокумент=Платежное поручение")
+
+        block_lines.append(f"Номер={t.number}")
+        block_lines.append(f"Дата={t.date.strftime('%d.%m.%Y')}")
+
+        # Сумма всегда положительная для iiko
+        block_lines.append(f"Сумма={abs(t.amount):.2f}")
+
+        # --- Плательщик ---
+        if t.payer_inn:
+            block_lines.append(f"ПлательщикИНН={t.payer_inn}")
+        else:
+            block_lines.append("ПлательщикИНН=")
+        block_lines.append(f"Плательщик1={t.payer_name or ''}")
+
+        if t.payer_account:
+            block_lines.append(f"ПлательщикРасчСчет={t.payer_account}")
+        else:
+            block_lines.append("ПлательщикРасчСчет=")
+
+        # --- Получатель ---
+        if t.recipient_inn:
+            block_lines.append(f"ПолучательИНН={t.recipient_inn}")
+        else:
+            block_lines.append("ПолучательИНН=")
+        block_lines.append(f"Получатель1={t.recipient_name or ''}")
+
+        if t.recipient_account:
+            block_lines.append(f"ПолучательРасчСчет={t.recipient_account}")
+        else:
+            block_lines.append("ПолучательРасчСчет=")
+
+        # Назначение
+        block_lines.append(f"НазначениеПлатежа={t.payment_details}")
+        block_lines.append(f"НазначениеПлатежа1={t.payment_details}")
+
+        # Даты поступления/списания
+        if t.date_income:
+            block_lines.append(f"ДатаПоступило={t.date_income.strftime('%d.%m.%Y')}")
+        else:
+            block_lines.append("ДатаПоступило=")
+
+        if t.date_outcome:
+            block_lines.append(f"ДатаСписано={t.date_outcome.strftime('%d.%m.%Y')}")
+        else:
+            block_lines.append("ДатаСписано=")
+
+        block_lines.append("КонецДокумента")
+        return block_lines
@@ -1,6 +1,7 @@
 # main.py
 
 from onik.project.services.bank_statement_service import BankStatementService
+from onik.project.parsers.contragent_resolver import ContragentResolver
 from onik.project.parsers.privatbank_pdf_parser import PrivatBankPdfParser
 from onik.project.parsers.taskombank_pdf_parser import TaskombankPdfParser
 
@@ -31,30 +32,22 @@ from onik.project.parsers.taskombank_pdf_parser import TaskombankPdfParser
 #if __name__ == "__main__":
 #    main()
 def main():
-    service = BankStatementService()
-    service.register_parser("privat_pdf", PrivatBankPdfParser())
-    service.register_parser("taskombank_pdf", TaskombankPdfParser())
-
-    # Получаем текст для каждого файла
-    privat_text = service.process_file("privat.pdf", "privat_pdf")
-    taskombank_text = service.process_file("taskombank.pdf", "taskombank_pdf")
-
-    # Если каждый блок заканчивается "КонецФайла", удалим его из первого блока
-    if privat_text.rstrip().endswith("КонецФайла"):
-        privat_text = privat_text.rstrip()[:-len("КонецФайла")].rstrip()
-
-    # Объединим оба результата и добавим один финальный "КонецФайла"
-    combined_text = privat_text + "\n" + taskombank_text
-    # Если последний блок уже содержит "КонецФайла", оставляем как есть,
-    # иначе можно добавить его:
-    if not combined_text.rstrip().endswith("КонецФайла"):
-        combined_text += "\nКонецФайла"
-
-    # Сохраняем результат в один файл
+    # Реквизиты контрагентов кэшируются между запусками в индексе на диске
+    resolver = ContragentResolver(index_path="contragents_index.json")
+    service = BankStatementService(contragent_resolver=resolver)
+    service.register_parser("privat_pdf", PrivatBankPdfParser(resolver))
+    service.register_parser("taskombank_pdf", TaskombankPdfParser(resolver))
+
+    # Все выписки сливаются в один файл с одной шапкой и "КонецФайла"
+    files = [
+        ("privat.pdf", "privat_pdf"),
+        ("taskombank.pdf", "taskombank_pdf"),
+    ]
     with open("out_for_syrve_combined.txt", "w") as f:
-        f.write(combined_text)
+        service.process_files(files, f)
 
     print("Объединённый файл успешно сформирован.")
+    print(f"Кэш контрагентов: {resolver.stats()}")
 
 
 if __name__ == "__main__":
@@ -1,17 +1,150 @@
 # parsers/base_parser.py
 
+import pdfplumber
 from abc import ABC, abstractmethod
-from typing import List
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple
 from onik.project.models.transaction import Transaction
+from onik.project.parsers.quarantine import Quarantine
 
 class BaseBankStatementParser(ABC):
     """
     Абстрактный базовый класс для всех парсеров банковских выписок.
+
+    Общий разбор PDF живёт здесь: обход страниц, выборка по карантину
+    (`selection`), постраничный карантин ошибок и освобождение страниц.
+    Парсер конкретного банка задаёт только:
+      - `MIN_ROW_CELLS` и `_data_rows()` - где в таблице строки данных;
+      - `_parse_row()` - разбор одной строки;
+      - `_extract_our_company_data()` - разбор шапки первой страницы.
     """
 
-    @abstractmethod
-    def parse(self, file_path: str) -> List[Transaction]:
+    # Строки данных с меньшим числом ячеек пропускаются
+    MIN_ROW_CELLS = 1
+
+    # Ошибки разбора последнего вызова parse()
+    quarantine: Quarantine
+
+    # Наш счёт из шапки (заполняется _extract_our_company_data)
+    our_company_account: Optional[str] = None
+
+    def parse(
+        self,
+        file_path: str,
+        quarantine: Optional[Quarantine] = None,
+        selection: Optional[Dict[int, Optional[Set[Tuple[int, int]]]]] = None
+    ) -> List[Transaction]:
         """
         Парсит входной файл и возвращает список транзакций.
+        Строки/страницы с ошибками не прерывают разбор, а складываются
+        в переданный `quarantine` - через него сервис получает ошибки
+        для sidecar-файла. `selection` - перепарсить только места
+        из карантина (см. Quarantine.selection).
+        """
+        return list(self.iter_transactions(file_path, quarantine, selection))
+
+    def iter_transactions(
+        self,
+        file_path: str,
+        quarantine: Optional[Quarantine] = None,
+        selection: Optional[Dict[int, Optional[Set[Tuple[int, int]]]]] = None
+    ) -> Iterator[Transaction]:
+        """
+        Потоковый вариант parse(): PDF открывается при первом обращении,
+        транзакции отдаются постранично.
         """
+        with pdfplumber.open(file_path) as pdf:
+            yield from self.iter_pages(pdf.pages, quarantine, selection, file_path)
+
+    def parse_pages(
+        self,
+        pages: Sequence,
+        quarantine: Optional[Quarantine] = None,
+        selection: Optional[Dict[int, Optional[Set[Tuple[int, int]]]]] = None,
+        file_path: str = ""
+    ) -> List[Transaction]:
+        return list(self.iter_pages(pages, quarantine, selection, file_path))
+
+    def iter_pages(
+        self,
+        pages: Sequence,
+        quarantine: Optional[Quarantine] = None,
+        selection: Optional[Dict[int, Optional[Set[Tuple[int, int]]]]] = None,
+        file_path: str = ""
+    ) -> Iterator[Transaction]:
+        """
+        Разбирает уже открытые страницы (объекты с extract_text/extract_tables).
+        Ошибочные строки/страницы не прерывают разбор, а попадают
+        в `self.quarantine`. `selection` (см. Quarantine.selection) -
+        разобрать только указанные страницы/строки.
+        Если не разобралась шапка, все строки данных уходят в карантин:
+        без наших реквизитов документы были бы неполными.
+        """
+        self.quarantine = quarantine if quarantine is not None else Quarantine()
+
+        # 1) Считываем "шапку" (первая страница)
+        header_error: Optional[Exception] = None
+        if pages:
+            try:
+                self._extract_our_company_data(pages[0])
+            except Exception as e:
+                header_error = ValueError(f"Не удалось разобрать шапку выписки: {type(e).__name__}: {e}")
+
+        # 2) Проходим по всем страницам, ищем таблицы
+        for page_index, page in enumerate(pages):
+            if selection is not None and page_index not in selection:
+                continue
+            selected_rows = selection[page_index] if selection is not None else None
+
+            # Страница разбирается целиком или целиком уходит в карантин
+            page_transactions: List[Transaction] = []
+            page_quarantine = Quarantine()
+            try:
+                tables = page.extract_tables() or []
+
+                for table_index, table in enumerate(tables):
+                    for row_index in self._data_rows(table):
+                        if selected_rows is not None and (table_index, row_index) not in selected_rows:
+                            continue
+                        row = table[row_index]
+                        if len(row) < self.MIN_ROW_CELLS:
+                            continue
+
+                        if header_error is not None:
+                            page_quarantine.add_row(file_path, page_index, table_index, row_index, row, header_error)
+                            continue
+                        try:
+                            page_transactions.append(self._parse_row(row))
+                        except Exception as e:
+                            page_quarantine.add_row(file_path, page_index, table_index, row_index, row, e)
+            except Exception as e:
+                self.quarantine.add_page(file_path, page_index, e)
+                continue
+
+            self.quarantine.extend(page_quarantine)
+            yield from page_transactions
+
+            # pdfplumber кэширует объекты страницы - освобождаем разобранную
+            close_page = getattr(page, "close", None)
+            if close_page is not None:
+                close_page()
+
+    @abstractmethod
+    def _data_rows(self, table: List[List[Optional[str]]]) -> Sequence[int]:
+        """
+        Номера строк данных в таблице; пустая последовательность,
+        если таблица - не таблица операций.
+        """
+        pass
+
+    @abstractmethod
+    def _parse_row(self, row: List[Optional[str]]) -> Transaction:
+        """
+        Разбирает одну строку данных таблицы.
+        Кидает исключение, если строку разобрать нельзя.
+        """
+        pass
+
+    @abstractmethod
+    def _extract_our_company_data(self, page) -> None:
+        """Заполняет наши реквизиты из шапки первой страницы."""
         pass
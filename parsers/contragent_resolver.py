@@ -0,0 +1,206 @@
+# parsers/contragent_resolver.py
+
+import json
+import logging
+import os
+import re
+import tempfile
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class ResolvedContragent:
+    """
+    Результат разбора строки реквизитов контрагента.
+    """
+    inn: str  # ИНН / ЄДРПОУ контрагента
+    account: str  # Расчётный счёт (IBAN)
+    name: str  # "Чистое" название контрагента
+
+
+class ContragentResolver:
+    """
+    Кэш разбора реквизитов контрагентов, общий для всех парсеров.
+
+    Одни и те же поставщики повторяются в тысячах строк выписок,
+    поэтому регулярки для ИНН/счёта/названия выполняем один раз
+    на уникальную строку, а дальше берём результат из словаря.
+
+    1) In-process LRU-кэш на `max_size` записей, ключ - сырая строка
+       реквизитов: попадание стоит одного поиска в словаре.
+    2) Опциональный persistent-индекс (JSON-файл), который
+       переживает перезапуски и загружается в память при старте.
+       Размер индекса ограничен `max_index_size` (старые записи вытесняются).
+       Битый или чужой файл индекса не мешает работе - индекс начинается заново.
+    3) Ключ индекса - нормализованная строка (схлопнутые пробелы);
+       нормализация выполняется только при промахе LRU.
+    Ключи включают пространство имён парсера: у каждого банка свои правила
+    очистки названия, и результаты разных парсеров не смешиваются.
+    4) Для каждого пространства имён хранится версия экстрактора:
+       после правки регулярок парсер поднимает версию, и старые
+       записи этого парсера выбрасываются из индекса.
+    """
+
+    # Версия формата файла индекса; файл другой версии игнорируется
+    INDEX_SCHEMA_VERSION = 1
+
+    def __init__(
+        self,
+        max_size: int = 4096,
+        index_path: Optional[str] = None,
+        max_index_size: int = 100000
+    ):
+        self.max_size = max_size
+        self.index_path = index_path
+        self.max_index_size = max_index_size
+
+        self._cache: "OrderedDict[str, ResolvedContragent]" = OrderedDict()
+        self._index: Dict[str, ResolvedContragent] = {}
+        self._index_versions: Dict[str, int] = {}
+        self._index_dirty = False
+
+        self.hits = 0
+        self.index_hits = 0
+        self.misses = 0
+
+        if index_path:
+            self.load_index()
+
+    @staticmethod
+    def normalize(raw: str) -> str:
+        """Схлопываем любые пробельные символы в один пробел."""
+        return re.sub(r"\s+", " ", raw or "").strip()
+
+    def resolve(
+        self,
+        raw: str,
+        extractor: Callable[[str], ResolvedContragent],
+        namespace: str = "",
+        version: int = 1,
+    ) -> ResolvedContragent:
+        """
+        Возвращает (ИНН, счёт, название) для строки реквизитов.
+        `extractor` вызывается только при промахе и получает уже
+        нормализованную строку. `version` - версия экстрактора.
+        """
+        if self._index_versions.get(namespace) != version:
+            self._reset_namespace(namespace, version)
+
+        cache_key = f"{namespace}|{raw}"
+        resolved = self._cache.get(cache_key)
+        if resolved is not None:
+            self._cache.move_to_end(cache_key)
+            self.hits += 1
+            return resolved
+
+        normalized = self.normalize(raw)
+        key = f"{namespace}|{normalized}"
+        resolved = self._index.get(key)
+        if resolved is not None:
+            self.index_hits += 1
+        else:
+            self.misses += 1
+            resolved = extractor(normalized)
+            if self.index_path:
+                self._index[key] = resolved
+                self._index_dirty = True
+                if len(self._index) > self.max_index_size:
+                    # dict хранит порядок вставки - вытесняем самую старую запись
+                    del self._index[next(iter(self._index))]
+
+        self._cache[cache_key] = resolved
+        if len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+        return resolved
+
+    def stats(self) -> Dict[str, float]:
+        """Статистика попаданий для логов/мониторинга."""
+        total = self.hits + self.index_hits + self.misses
+        return {
+            "hits": self.hits,
+            "index_hits": self.index_hits,
+            "misses": self.misses,
+            "size": len(self._cache),
+            "index_size": len(self._index),
+            "hit_rate": (self.hits + self.index_hits) / total if total else 0.0,
+        }
+
+    def clear(self) -> None:
+        """Сбрасывает LRU-кэш и счётчики (persistent-индекс не трогаем)."""
+        self._cache.clear()
+        self.hits = 0
+        self.index_hits = 0
+        self.misses = 0
+
+    # ---------------- Persistent-индекс ----------------
+
+    def _reset_namespace(self, namespace: str, version: int) -> None:
+        """Версия экстрактора сменилась - старые результаты парсера недействительны."""
+        prefix = f"{namespace}|"
+        stale = [key for key in self._index if key.startswith(prefix)]
+        for key in stale:
+            del self._index[key]
+        for key in [key for key in self._cache if key.startswith(prefix)]:
+            del self._cache[key]
+        self._index_versions[namespace] = version
+        if self.index_path:
+            self._index_dirty = True
+
+    def load_index(self) -> None:
+        if not self.index_path or not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if not isinstance(data, dict) or data.get("schema") != self.INDEX_SCHEMA_VERSION:
+                raise ValueError(f"неизвестный формат (schema={data.get('schema') if isinstance(data, dict) else None})")
+            versions = {str(ns): int(v) for ns, v in data["versions"].items()}
+            index = {
+                key: ResolvedContragent(inn=value[0], account=value[1], name=value[2])
+                for key, value in data["entries"].items()
+            }
+        except (OSError, ValueError, KeyError, TypeError, IndexError, AttributeError) as e:
+            # Индекс - всего лишь кэш: битый/чужой файл не должен останавливать работу
+            logger.warning("Индекс контрагентов '%s' не прочитан (%s), начинаем заново", self.index_path, e)
+            self._index = {}
+            self._index_versions = {}
+            self._index_dirty = True
+            return
+        self._index_versions = versions
+        self._index = index
+        self._index_dirty = False
+
+    def save_index(self) -> None:
+        """Сохраняет индекс на диск (только если были новые записи)."""
+        if not self.index_path or not self._index_dirty:
+            return
+        data = {
+            "schema": self.INDEX_SCHEMA_VERSION,
+            "versions": self._index_versions,
+            "entries": {
+                key: [value.inn, value.account, value.name]
+                for key, value in self._index.items()
+            },
+        }
+        # Уникальный временный файл рядом с индексом: параллельные запуски
+        # не пишут в один и тот же .tmp, а os.replace атомарно подменяет индекс
+        index_dir = os.path.dirname(os.path.abspath(self.index_path))
+        fd, tmp_path = tempfile.mkstemp(
+            dir=index_dir, prefix=os.path.basename(self.index_path) + ".", suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.index_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._index_dirty = False
+
+
+# Общий экземпляр для всех парсеров по умолчанию
+default_contragent_resolver = ContragentResolver()
@@ -1,9 +1,14 @@
-import pdfplumber
 import re
 from typing import List, Optional
 from datetime import datetime
 
 from onik.project.parsers.base_parser import BaseBankStatementParser
+from onik.project.parsers.contragent_resolver import (
+    ContragentResolver,
+    ResolvedContragent,
+    default_contragent_resolver,
+)
+from onik.project.parsers.quarantine import Quarantine
 from onik.project.models.transaction import Transaction
 
 class PrivatBankPdfParser(BaseBankStatementParser):
@@ -19,7 +24,14 @@ class PrivatBankPdfParser(BaseBankStatementParser):
        внутри `ПолучательРасчСчет=` и т.д.
     """
 
-    def __init__(self):
+    # Поднимать при изменении _resolve_contragent и вызываемых им методов,
+    # чтобы persistent-индекс контрагентов не отдавал старые результаты
+    CONTRAGENT_EXTRACTOR_VERSION = 1
+
+    def __init__(self, resolver: Optional[ContragentResolver] = None):
+        # Кэш реквизитов контрагентов (по умолчанию общий для всех парсеров)
+        self.resolver = resolver or default_contragent_resolver
+
         self.our_company_name: Optional[str] = None
         self.our_company_inn: Optional[str] = None
         self.our_company_account: Optional[str] = None
@@ -27,90 +39,85 @@ class PrivatBankPdfParser(BaseBankStatementParser):
         self.our_bank_edrpou: Optional[str] = None
         self.our_bank_branch: Optional[str] = None
 
-    def parse(self, file_path: str) -> List[Transaction]:
-        transactions: List[Transaction] = []
-        with pdfplumber.open(file_path) as pdf:
-            # 1) Считываем "шапку" (первая страница)
-            if pdf.pages:
-                self._extract_our_company_data(pdf.pages[0])
-
-            # 2) Проходим по всем страницам, ищем таблицы
-            for page in pdf.pages:
-                tables = page.extract_tables()
-                if not tables:
-                    continue
-
-                for table in tables:
-                    # Нужно минимум 4 строки: [0] - остатки, [1,2] - заголовок, [3..] - данные
-                    if len(table) < 4:
-                        continue
-
-                    # row[1], row[2] - двухэтажный заголовок
-                    header1 = table[1]
-                    header2 = table[2]
-                    if len(header1) < 7 or len(header2) < 7:
-                        continue
-
-                    # row[3..] - данные
-                    data_rows = table[3:]
-                    for row_data in data_rows:
-                        if len(row_data) < 7:
-                            continue
-
-                        # 0: Номер документа
-                        doc_number = (row_data[0] or "").strip()
-                        # 1: Дата + время
-                        date_str = (row_data[1] or "").strip()
-                        # 2: Сумма
-                        amount_str = (row_data[2] or "").replace(",", ".").replace(" ", "")
-                        # 3: Назначение платежа
-                        payment_details = (row_data[3] or "").strip()
-
-                        # Парсим дату/время
-                        op_date = self._parse_date(date_str)
-
-                        # Парсим сумму
-                        try:
-                            amount = float(amount_str)
-                        except ValueError:
-                            amount = 0.0
-
-                        # 5: часть реквизитов контрагента
-                        part1 = (row_data[5] or "").splitlines()
-                        # 6: остальная часть реквизитов
-                        part2 = (row_data[6] or "").splitlines()
-                        # Склеиваем всё в одну строку
-                        contragent_full = " ".join(part1 + part2).strip()
-                        contragent_full = re.sub(r"\s+", " ", contragent_full)
-
-                        # Ищем ИНН, счёт
-                        contragent_inn = self._find_inn(contragent_full)
-                        contragent_account = self._find_account(contragent_full)
-                        # "Чистое" название контрагента (убираем INN и счёт из строки)
-                        contragent_name = self._clean_name(contragent_full, contragent_inn, contragent_account)
-
-                        # Собираем Transaction
-                        transaction = self._build_transaction(
-                            number=doc_number,
-                            op_date=op_date,
-                            amount=amount,
-                            payment_details=payment_details,
-                            contragent_name=contragent_name.strip(),
-                            contragent_inn=contragent_inn,
-                            contragent_account=contragent_account
-                        )
-
-                        # (Дополнительно) Распределяем ИНН/счёт в зависимости от знака суммы
-                        if amount < 0:  # расход
-                            transaction.recipient_inn = contragent_inn
-                            transaction.recipient_account = contragent_account
-                        else:  # приход
-                            transaction.payer_inn = contragent_inn
-                            transaction.payer_account = contragent_account
-
-                        transactions.append(transaction)
-
-        return transactions
+        # Ошибки разбора последнего вызова parse()
+        self.quarantine = Quarantine()
+
+    # Строка данных: №, дата, сумма, назначение, ..., реквизиты контрагента (5, 6)
+    MIN_ROW_CELLS = 7
+
+    def _data_rows(self, table: List[List[Optional[str]]]) -> range:
+        # Нужно минимум 4 строки: [0] - остатки, [1,2] - заголовок, [3..] - данные
+        if len(table) < 4:
+            return range(0)
+
+        # row[1], row[2] - двухэтажный заголовок
+        header1 = table[1]
+        header2 = table[2]
+        if len(header1) < 7 or len(header2) < 7:
+            return range(0)
+
+        # row[3..] - данные
+        return range(3, len(table))
+
+    def _parse_row(self, row_data: List[Optional[str]]) -> Transaction:
+        """
+        Разбирает одну строку данных таблицы.
+        Кидает ValueError на нераспознанной дате или сумме.
+        """
+        # 0: Номер документа
+        doc_number = (row_data[0] or "").strip()
+        # 1: Дата + время
+        date_str = (row_data[1] or "").strip()
+        # 2: Сумма
+        amount_str = (row_data[2] or "").replace(",", ".").replace(" ", "")
+        # 3: Назначение платежа
+        payment_details = (row_data[3] or "").strip()
+
+        # Парсим дату/время
+        op_date = self._parse_date(date_str)
+
+        # Парсим сумму
+        try:
+            amount = float(amount_str)
+        except ValueError:
+            raise ValueError(f"Не удалось разобрать сумму: {row_data[2]!r}")
+
+        # 5: часть реквизитов контрагента
+        part1 = (row_data[5] or "").splitlines()
+        # 6: остальная часть реквизитов
+        part2 = (row_data[6] or "").splitlines()
+        # Склеиваем всё в одну строку
+        contragent_full = " ".join(part1 + part2)
+
+        # ИНН, счёт и "чистое" название - через общий кэш контрагентов
+        contragent = self.resolver.resolve(
+            contragent_full, self._resolve_contragent,
+            namespace="privat", version=self.CONTRAGENT_EXTRACTOR_VERSION
+        )
+        contragent_inn = contragent.inn
+        contragent_account = contragent.account
+        contragent_name = contragent.name
+
+        # Собираем Transaction
+        transaction = self._build_transaction(
+            number=doc_number,
+            op_date=op_date,
+            amount=amount,
+            payment_details=payment_details,
+            contragent_name=contragent_name.strip(),
+            contragent_inn=contragent_inn,
+            contragent_account=contragent_account
+        )
+
+        # (Дополнительно) Распределяем ИНН/счёт в зависимости от знака суммы
+        if amount < 0:  # расход
+            transaction.recipient_inn = contragent_inn
+            transaction.recipient_account = contragent_account
+        else:  # приход
+            transaction.payer_inn = contragent_inn
+            transaction.payer_account = contragent_account
+
+        return transaction
 
     # ----------------- Вспомогательные методы --------------------
 
@@ -144,7 +151,19 @@ class PrivatBankPdfParser(BaseBankStatementParser):
                 return datetime.strptime(date_str.strip(), f)
             except ValueError:
                 continue
-        return datetime.now()
+        raise ValueError(f"Не удалось разобрать дату: {date_str!r}")
+
+    def _resolve_contragent(self, contragent_full: str) -> ResolvedContragent:
+        """Разбор строки реквизитов (вызывается только при промахе кэша)."""
+        contragent_inn = self._find_inn(contragent_full)
+        contragent_account = self._find_account(contragent_full)
+        # "Чистое" название контрагента (убираем INN и счёт из строки)
+        contragent_name = self._clean_name(contragent_full, contragent_inn, contragent_account)
+        return ResolvedContragent(
+            inn=contragent_inn,
+            account=contragent_account,
+            name=contragent_name,
+        )
 
     def _find_inn(self, text: str) -> str:
         """Ищем "ЄДРПОУ: 12345678" или 8–10 цифр подряд."""
@@ -0,0 +1,110 @@
+# parsers/quarantine.py
+
+import json
+import os
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+
+@dataclass
+class QuarantineRecord:
+    """
+    Строка или страница выписки, которую не удалось разобрать.
+    Если row_index пустой - в карантине вся страница.
+    """
+    file_path: str  # Исходный файл выписки
+    page_index: int  # Номер страницы (с 0)
+    table_index: Optional[int]  # Номер таблицы на странице
+    row_index: Optional[int]  # Номер строки в таблице
+    error: str  # Текст ошибки
+    cells: Optional[List[Optional[str]]]  # "Сырые" ячейки строки
+
+
+class Quarantine:
+    """
+    Сборщик ошибок разбора: плохие строки/страницы не прерывают parse(),
+    а попадают сюда вместе с сырыми ячейками и номером страницы.
+    Пишется в sidecar-файл (JSON Lines) рядом с выпиской, а после
+    исправления парсера по нему перепарсиваются только эти места.
+    """
+
+    def __init__(self, records: Optional[List[QuarantineRecord]] = None):
+        self.records: List[QuarantineRecord] = records or []
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def add_row(
+        self,
+        file_path: str,
+        page_index: int,
+        table_index: int,
+        row_index: int,
+        cells: List[Optional[str]],
+        error: Exception
+    ) -> None:
+        self.records.append(QuarantineRecord(
+            file_path=file_path,
+            page_index=page_index,
+            table_index=table_index,
+            row_index=row_index,
+            error=f"{type(error).__name__}: {error}",
+            cells=list(cells),
+        ))
+
+    def add_page(self, file_path: str, page_index: int, error: Exception) -> None:
+        self.records.append(QuarantineRecord(
+            file_path=file_path,
+            page_index=page_index,
+            table_index=None,
+            row_index=None,
+            error=f"{type(error).__name__}: {error}",
+            cells=None,
+        ))
+
+    def extend(self, other: "Quarantine") -> None:
+        self.records.extend(other.records)
+
+    def selection(self) -> Dict[int, Optional[Set[Tuple[int, int]]]]:
+        """
+        Что перепарсить: {страница: {(таблица, строка), ...}}.
+        None вместо множества - перепарсить страницу целиком.
+        Карантин (как и его sidecar) относится к одной выписке.
+        """
+        selection: Dict[int, Optional[Set[Tuple[int, int]]]] = {}
+        for record in self.records:
+            if record.row_index is None:
+                selection[record.page_index] = None
+            elif record.page_index not in selection or selection[record.page_index] is not None:
+                selection.setdefault(record.page_index, set()).add(
+                    (record.table_index, record.row_index)
+                )
+        return selection
+
+    # ---------------- Sidecar-файл ----------------
+
+    @staticmethod
+    def sidecar_path(file_path: str) -> str:
+        return f"{file_path}.quarantine.jsonl"
+
+    def write(self, path: str) -> None:
+        """
+        Перезаписывает sidecar; если ошибок нет - удаляет старый,
+        чтобы по нему не перепарсили уже исправленное.
+        """
+        if not self.records:
+            if os.path.exists(path):
+                os.remove(path)
+            return
+        with open(path, "w", encoding="utf-8") as f:
+            for record in self.records:
+                f.write(json.dumps(asdict(record), ensure_ascii=False) + "\n")
+
+    @classmethod
+    def load(cls, path: str) -> "Quarantine":
+        records = []
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    records.append(QuarantineRecord(**json.loads(line)))
+        return cls(records)
@@ -1,9 +1,14 @@
-import pdfplumber
 import re
 from typing import List, Optional
 from datetime import datetime
 
 from onik.project.parsers.base_parser import BaseBankStatementParser
+from onik.project.parsers.contragent_resolver import (
+    ContragentResolver,
+    ResolvedContragent,
+    default_contragent_resolver,
+)
+from onik.project.parsers.quarantine import Quarantine
 from onik.project.models.transaction import Transaction
 
 class TaskombankPdfParser(BaseBankStatementParser):
@@ -20,7 +25,14 @@ class TaskombankPdfParser(BaseBankStatementParser):
     4) Склеивает многострочные ячейки реквизитов контрагента.
     """
 
-    def __init__(self):
+    # Поднимать при изменении _resolve_contragent и вызываемых им методов,
+    # чтобы persistent-индекс контрагентов не отдавал старые результаты
+    CONTRAGENT_EXTRACTOR_VERSION = 1
+
+    def __init__(self, resolver: Optional[ContragentResolver] = None):
+        # Кэш реквизитов контрагентов (по умолчанию общий для всех парсеров)
+        self.resolver = resolver or default_contragent_resolver
+
         # Данные нашей компании (заполняются из шапки)
         self.our_company_name: Optional[str] = None
         self.our_company_inn: Optional[str] = None
@@ -29,83 +41,82 @@ class TaskombankPdfParser(BaseBankStatementParser):
         self.our_bank_name: Optional[str] = None
         self.our_bank_id: Optional[str] = None
 
-    def parse(self, file_path: str) -> List[Transaction]:
-        transactions: List[Transaction] = []
-        with pdfplumber.open(file_path) as pdf:
-            # 1) Считываем "шапку" (первая страница)
-            if pdf.pages:
-                self._extract_our_company_data(pdf.pages[0])
-
-            # 2) Проходим по всем страницам, извлекаем таблицы
-            for page in pdf.pages:
-                tables = page.extract_tables()
-                if not tables:
-                    continue
-
-                for table in tables:
-                    if len(table) < 2:
-                        continue
-
-                    header = table[0]
-                    if len(header) < 5:
-                        continue
-
-                    data_rows = table[1:]
-                    for row in data_rows:
-                        if len(row) < 5:
-                            continue
-
-                        date_str = (row[0] or "").strip()
-                        debit_str = (row[1] or "").replace(",", ".").replace(" ", "")
-                        credit_str = (row[2] or "").replace(",", ".").replace(" ", "")
-
-                        corr_info_raw = (row[3] or "")
-                        payment_details = (row[4] or "").strip()
-
-                        # Парсим дату
-                        op_date = self._parse_date(date_str)
-
-                        # Определяем сумму (если в дебете > 0 => расход, если в кредите => приход)
-                        amount = 0.0
-                        if debit_str:
-                            try:
-                                amount = -float(debit_str)
-                            except ValueError:
-                                amount = 0.0
-                        elif credit_str:
-                            try:
-                                amount = float(credit_str)
-                            except ValueError:
-                                amount = 0.0
-
-                        # Склеиваем ячейки реквизитов контрагента
-                        lines = corr_info_raw.splitlines()
-                        corr_info = " ".join(line.strip() for line in lines)
-                        corr_info = re.sub(r"\s+", " ", corr_info).strip()
-
-                        # Дополнительно можно искать "Номер док-та: XXX"
-                        doc_number = self._extract_doc_number(corr_info + " " + payment_details)
-
-                        # Ищем INN, счёт
-                        contragent_inn = self._extract_inn(corr_info)
-                        contragent_account = self._extract_account(corr_info)
-
-                        # Название контрагента
-                        contragent_name = self._cleanup_name(corr_info, contragent_inn, contragent_account)
-
-                        # Формируем Transaction
-                        transaction = self._build_transaction(
-                            doc_number=doc_number,
-                            op_date=op_date,
-                            amount=amount,
-                            payment_details=payment_details,
-                            contragent_name=contragent_name,
-                            contragent_inn=contragent_inn,
-                            contragent_account=contragent_account
-                        )
-                        transactions.append(transaction)
-
-        return transactions
+        # Ошибки разбора последнего вызова parse()
+        self.quarantine = Quarantine()
+
+    # Строка данных: дата, дебет, кредит, реквизиты, назначение
+    MIN_ROW_CELLS = 5
+
+    def _data_rows(self, table: List[List[Optional[str]]]) -> range:
+        # [0] - заголовок, [1..] - данные
+        if len(table) < 2:
+            return range(0)
+
+        header = table[0]
+        if len(header) < 5:
+            return range(0)
+
+        return range(1, len(table))
+
+    def _parse_row(self, row: List[Optional[str]]) -> Transaction:
+        """
+        Разбирает одну строку данных таблицы.
+        Кидает ValueError на нераспознанной дате или сумме.
+        """
+        date_str = (row[0] or "").strip()
+        debit_str = (row[1] or "").replace(",", ".").replace(" ", "")
+        credit_str = (row[2] or "").replace(",", ".").replace(" ", "")
+
+        corr_info_raw = (row[3] or "")
+        payment_details = (row[4] or "").strip()
+
+        # Парсим дату
+        op_date = self._parse_date(date_str)
+
+        # Определяем сумму (если в дебете > 0 => расход, если в кредите => приход)
+        if debit_str:
+            try:
+                amount = -float(debit_str)
+            except ValueError:
+                raise ValueError(f"Не удалось разобрать дебет: {row[1]!r}")
+        elif credit_str:
+            try:
+                amount = float(credit_str)
+            except ValueError:
+                raise ValueError(f"Не удалось разобрать кредит: {row[2]!r}")
+        else:
+            raise ValueError("Не заполнены ни дебет, ни кредит")
+
+        # Склеиваем ячейки реквизитов контрагента
+        lines = corr_info_raw.splitlines()
+        corr_info = " ".join(line.strip() for line in lines)
+        corr_info = re.sub(r"\s+", " ", corr_info).strip()
+
+        # Дополнительно можно искать "Номер док-та: XXX"
+        doc_number = self._extract_doc_number(corr_info + " " + payment_details)
+
+        # INN, счёт и название контрагента - через общий кэш контрагентов
+        # Ключ кэша - сырая ячейка, чтобы попадание не требовало регулярок
+        contragent = self.resolver.resolve(
+            corr_info_raw, self._resolve_contragent,
+            namespace="taskombank", version=self.CONTRAGENT_EXTRACTOR_VERSION
+        )
+        contragent_inn = contragent.inn
+        contragent_account = contragent.account
+        contragent_name = contragent.name
+
+        # Формируем Transaction
+        transaction = self._build_transaction(
+            doc_number=doc_number,
+            op_date=op_date,
+            amount=amount,
+            payment_details=payment_details,
+            contragent_name=contragent_name,
+            contragent_inn=contragent_inn,
+            contragent_account=contragent_account
+        )
+
+        return transaction
 
     # ---------------- Вспомогательные методы ----------------
 
@@ -146,7 +157,7 @@ class TaskombankPdfParser(BaseBankStatementParser):
                 return datetime.strptime(date_str.strip(), fmt)
             except ValueError:
                 continue
-        return datetime.now()
+        raise ValueError(f"Не удалось разобрать дату: {date_str!r}")
 
     def _extract_doc_number(self, text: str) -> str:
         match = re.search(r'Номер\s+док-та:\s*(\S+)', text)
@@ -154,6 +165,19 @@ class TaskombankPdfParser(BaseBankStatementParser):
             return match.group(1)
         return "UNKNOWN"
 
+    def _resolve_contragent(self, corr_info: str) -> ResolvedContragent:
+        """
+        Разбор строки реквизитов (вызывается только при промахе кэша).
+        """
+        contragent_inn = self._extract_inn(corr_info)
+        contragent_account = self._extract_account(corr_info)
+        contragent_name = self._cleanup_name(corr_info, contragent_inn, contragent_account)
+        return ResolvedContragent(
+            inn=contragent_inn,
+            account=contragent_account,
+            name=contragent_name,
+        )
+
     def _extract_inn(self, text: str) -> str:
         """
         Ищем "ЄДРПОУ: 12345678" либо 8-10 цифр подряд.
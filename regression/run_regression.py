@@ -0,0 +1,431 @@
+# regression/run_regression.py
+
+"""
+Регрессия парсеров и генератора на синтетическом корпусе выписок.
+
+1) Каждый файл corpus/*.json прогоняется через нужный парсер
+   (PrivatBankPdfParser / TaskombankPdfParser) и Iiko1CFileGenerator.
+2) Результат сравнивается с эталоном golden/<имя>.txt побайтово,
+   кроме строк ДатаСоздания/ВремяСоздания. Слияние корректных выписок
+   через write_merged_file сверяется с golden/merged.txt, а карантин
+   ошибочных строк/страниц - с golden/<имя>.quarantine.jsonl.
+   Выписки с "faulty": true - намеренно битые, на них проверяется
+   карантин; в слияние и замер скорости они не входят. По их "fixes"
+   битые ячейки/страницы исправляются в памяти и проверяется перепарс
+   BankStatementService.reparse_quarantined: обратно приходят только
+   строки/страницы из карантина, sidecar перезаписывается или удаляется.
+3) Замеряется скорость (строк/сек) разбора каждой выписки и их слияния
+   (сортировка + write_merged_file) и делится на скорость калибровочного
+   цикла в том же процессе - так результат не зависит от машины.
+   Если относительная скорость упала больше, чем на max_slowdown_percent
+   относительно baseline.json - регрессия.
+
+Запуск:
+    python -m onik.project.regression.run_regression
+    python -m onik.project.regression.run_regression --update-golden
+    python -m onik.project.regression.run_regression --update-baseline
+"""
+
+import argparse
+import copy
+import glob
+import io
+import itertools
+import json
+import os
+import re
+import statistics
+import sys
+import tempfile
+import time
+from dataclasses import asdict
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from onik.project.generators.iiko_1c_file_generator import Iiko1CFileGenerator
+from onik.project.models.transaction import Transaction
+from onik.project.parsers.base_parser import BaseBankStatementParser
+from onik.project.parsers.contragent_resolver import ContragentResolver
+from onik.project.parsers.privatbank_pdf_parser import PrivatBankPdfParser
+from onik.project.parsers.quarantine import Quarantine
+from onik.project.parsers.taskombank_pdf_parser import TaskombankPdfParser
+from onik.project.services.bank_statement_service import BankStatementService
+from onik.project.services.transaction_sorter import iter_sorted_by_date
+
+REGRESSION_DIR = os.path.dirname(os.path.abspath(__file__))
+CORPUS_DIR = os.path.join(REGRESSION_DIR, "corpus")
+GOLDEN_DIR = os.path.join(REGRESSION_DIR, "golden")
+BASELINE_PATH = os.path.join(REGRESSION_DIR, "baseline.json")
+
+# Фиксированный момент формирования файла, чтобы ДатаНачала/ДатаКонца
+# в эталонах не зависели от дня запуска
+FIXED_NOW = datetime(2026, 1, 1, 12, 0, 0)
+
+# Маленький кусок сортировки, чтобы слияние проходило через временные файлы
+MERGE_SORT_CHUNK_SIZE = 16
+
+# Поля шапки, которые не сравниваем с эталоном
+IGNORED_FIELDS = ("ДатаСоздания=", "ВремяСоздания=")
+
+PARSER_FACTORIES = {
+    "privat_pdf": PrivatBankPdfParser,
+    "taskombank_pdf": TaskombankPdfParser,
+}
+
+
+class SyntheticPage:
+    """
+    Страница синтетической выписки с тем же интерфейсом,
+    что и pdfplumber.Page (extract_text / extract_tables).
+    """
+
+    def __init__(self, text: str, tables: List[List[List[Optional[str]]]]):
+        self.text = text
+        self.tables = tables
+
+    def extract_text(self) -> str:
+        return self.text
+
+    def extract_tables(self) -> List[List[List[Optional[str]]]]:
+        return self.tables
+
+
+def load_corpus() -> Dict[str, dict]:
+    corpus = {}
+    for path in sorted(glob.glob(os.path.join(CORPUS_DIR, "*.json"))):
+        name = os.path.splitext(os.path.basename(path))[0]
+        with open(path, "r", encoding="utf-8") as f:
+            corpus[name] = json.load(f)
+    return corpus
+
+
+def build_pages(statement: dict) -> List[SyntheticPage]:
+    return [
+        SyntheticPage(page.get("text", ""), page.get("tables", []))
+        for page in statement["pages"]
+    ]
+
+
+def make_parser(statement: dict) -> BaseBankStatementParser:
+    # Свой кэш контрагентов на каждый прогон, чтобы замеры были сопоставимы
+    return PARSER_FACTORIES[statement["parser"]](resolver=ContragentResolver())
+
+
+def render(statement: dict) -> str:
+    parser = make_parser(statement)
+    transactions = parser.parse_pages(build_pages(statement))
+    return Iiko1CFileGenerator().generate_file_content(transactions, now=FIXED_NOW)
+
+
+def render_quarantine(name: str, statement: dict) -> str:
+    quarantine = Quarantine()
+    make_parser(statement).parse_pages(build_pages(statement), quarantine, file_path=f"{name}.pdf")
+    return "".join(
+        json.dumps(asdict(record), ensure_ascii=False) + "\n"
+        for record in quarantine.records
+    )
+
+
+def merge_stream(statement: dict) -> Tuple[str, Iterator[Transaction]]:
+    """(наш счёт из шапки, транзакции по дате) - как в BankStatementService.process_files."""
+    parser = make_parser(statement)
+    stream = iter_sorted_by_date(parser.iter_pages(build_pages(statement)), MERGE_SORT_CHUNK_SIZE)
+    first = next(stream, None)
+    account = parser.our_company_account or ""
+    return account, (itertools.chain([first], stream) if first is not None else stream)
+
+
+def render_merged(corpus: Dict[str, dict]) -> str:
+    streams = [
+        merge_stream(statement)
+        for statement in corpus.values()
+        if not statement.get("faulty")
+    ]
+    output = io.StringIO()
+    Iiko1CFileGenerator().write_merged_file(streams, output, now=FIXED_NOW)
+    return output.getvalue()
+
+
+def apply_fixes(statement: dict, with_pages: bool) -> dict:
+    """
+    Копия битой выписки с исправленными ячейками из "fixes";
+    `with_pages` - заодно подставить таблицы битых страниц.
+    """
+    fixed = copy.deepcopy(statement)
+    for fix in statement.get("fixes", []):
+        page = fixed["pages"][fix["page"]]
+        if "tables" in fix:
+            if with_pages:
+                page["tables"] = copy.deepcopy(fix["tables"])
+        else:
+            page["tables"][fix["table"]][fix["row"]][fix["cell"]] = fix["value"]
+    return fixed
+
+
+def bind_pages(parser: BaseBankStatementParser, source: dict) -> None:
+    """
+    parse()/iter_transactions() парсера читают страницы не из PDF,
+    а из source["statement"] - выписку можно подменять между вызовами.
+    """
+    def iter_transactions(file_path, quarantine=None, selection=None):
+        return parser.iter_pages(build_pages(source["statement"]), quarantine, selection, file_path)
+    parser.iter_transactions = iter_transactions
+
+
+def document_blocks(text: str) -> List[Tuple[str, ...]]:
+    """Документы файла для iiko без шапок (в них дата запуска), по порядку."""
+    blocks = []
+    block: Optional[List[str]] = None
+    for line in text.split("\n"):
+        if line.startswith("Документ="):
+            block = []
+        if block is not None:
+            block.append(line)
+            if line == "КонецДокумента":
+                blocks.append(tuple(block))
+                block = None
+    return blocks
+
+
+def check_reparse(name: str, statement: dict) -> Optional[str]:
+    """
+    Перепарс по карантину через BankStatementService.reparse_quarantined:
+      1) process_file пишет sidecar битой выписки.
+      2) Исправлены только ячейки - перепарс возвращает эти строки,
+         в sidecar остаются только битые страницы.
+      3) Исправлены и страницы - перепарс возвращает их строки,
+         sidecar удаляется.
+    Вместе перепарсы должны дать ровно те документы исправленной
+    выписки, которых не было в первом разборе.
+    """
+    accepted = make_parser(statement).parse_pages(build_pages(statement))
+    restored = make_parser(statement).parse_pages(build_pages(apply_fixes(statement, with_pages=True)))
+    for t in accepted:
+        restored.remove(t)
+    page_fixes = sum(1 for fix in statement["fixes"] if "tables" in fix)
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        file_path = os.path.join(tmp_dir, f"{name}.pdf")
+        sidecar = Quarantine.sidecar_path(file_path)
+
+        source = {"statement": statement}
+        parser = make_parser(statement)
+        bind_pages(parser, source)
+        service = BankStatementService(contragent_resolver=parser.resolver)
+        service.register_parser(statement["parser"], parser)
+
+        service.process_file(file_path, statement["parser"])
+        if not os.path.exists(sidecar):
+            return f"{name}: process_file не записал sidecar карантина"
+
+        source["statement"] = apply_fixes(statement, with_pages=False)
+        rows_text = service.reparse_quarantined(file_path, statement["parser"])
+        left = Quarantine.load(sidecar).records if os.path.exists(sidecar) else []
+        if len(left) != page_fixes or any(record.row_index is not None for record in left):
+            return f"{name}: после перепарса строк в sidecar {len(left)} записей вместо {page_fixes} страниц"
+
+        source["statement"] = apply_fixes(statement, with_pages=True)
+        pages_text = service.reparse_quarantined(file_path, statement["parser"])
+        if os.path.exists(sidecar):
+            return f"{name}: sidecar не удалён после полного перепарса"
+    finally:
+        for entry in os.listdir(tmp_dir):
+            os.remove(os.path.join(tmp_dir, entry))
+        os.rmdir(tmp_dir)
+
+    expected = document_blocks(Iiko1CFileGenerator().generate_file_content(restored))
+    actual = document_blocks(rows_text) + document_blocks(pages_text)
+    if sorted(actual) != sorted(expected):
+        return (f"{name}: перепарс вернул {len(actual)} документов, "
+                f"ожидалось {len(expected)} восстановленных из карантина")
+    return None
+
+
+def mask_ignored(text: str) -> str:
+    lines = []
+    for line in text.split("\n"):
+        for field in IGNORED_FIELDS:
+            if line.startswith(field):
+                line = field
+                break
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def count_rows(statement: dict) -> int:
+    return len(make_parser(statement).parse_pages(build_pages(statement)))
+
+
+def timed_rate(work, units: int, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        work()
+    elapsed = time.perf_counter() - start
+    return units * repeat / elapsed if elapsed else float("inf")
+
+
+def calibration_work() -> None:
+    """
+    Фиксированная нагрузка того же рода, что и разбор строки выписки:
+    регулярки, strptime и форматирование.
+    """
+    for i in range(200):
+        text = f"ТОВ  \"ПОСТАЧАЛЬНИК {i}\"\n ЄДРПОУ: {32165400 + i} Рахунок: UA21322313000002600723356{i:04d}"
+        text = re.sub(r"\s+", " ", text).strip()
+        re.search(r"ЄДРПОУ:\s*(\d+)", text)
+        datetime.strptime(f"{1 + i % 28:02d}.10.2026 10:15", "%d.%m.%Y %H:%M")
+        f"Сумма={i * 1.5:.2f}"
+
+
+def measure_relative_throughput(
+    work: Callable[[], object],
+    rows: int,
+    repeat: int,
+    rounds: int
+) -> Tuple[float, float]:
+    """
+    Возвращает (строк/сек, строк/сек на единицу скорости калибровки).
+    Один прогрев, затем `rounds` раундов, в каждом - замер `work` и
+    сразу замер калибровки, чтобы оба видели одинаковую загрузку машины.
+    Берётся медиана по раундам.
+    """
+    work()
+    calibration_work()
+
+    rows_rates = []
+    ratios = []
+    for _ in range(rounds):
+        rows_per_sec = timed_rate(work, rows, repeat)
+        calibration_per_sec = timed_rate(calibration_work, 1, repeat)
+        rows_rates.append(rows_per_sec)
+        ratios.append(rows_per_sec / calibration_per_sec)
+    return statistics.median(rows_rates), statistics.median(ratios)
+
+
+def check_golden(
+    name: str,
+    actual: str,
+    update: bool,
+    extension: str = "txt",
+    optional: bool = False
+) -> Optional[str]:
+    """
+    Возвращает текст ошибки или None, если вывод совпал с эталоном.
+    `optional` - отсутствующий эталон означает пустой вывод.
+    """
+    path = os.path.join(GOLDEN_DIR, f"{name}.{extension}")
+
+    if update:
+        # Пустой карантин эталоном не сохраняем
+        if actual or not optional:
+            with open(path, "w", encoding="utf-8", newline="") as f:
+                f.write(actual)
+        return None
+
+    if not os.path.exists(path):
+        if optional:
+            expected = ""
+        else:
+            return f"{name}: нет эталона {path} (запустите с --update-golden)"
+    else:
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            expected = f.read()
+
+    actual_lines = mask_ignored(actual).split("\n")
+    expected_lines = mask_ignored(expected).split("\n")
+    for i, (a, e) in enumerate(zip(actual_lines, expected_lines), start=1):
+        if a != e:
+            return f"{name}: строка {i} отличается от эталона:\n  ожидалось: {e!r}\n  получено:  {a!r}"
+    if len(actual_lines) != len(expected_lines):
+        return f"{name}: {len(actual_lines)} строк вместо {len(expected_lines)} в эталоне"
+    return None
+
+
+def load_baseline() -> dict:
+    if not os.path.exists(BASELINE_PATH):
+        return {"max_slowdown_percent": 25.0, "repeat": 50, "rounds": 5, "relative_throughput": {}}
+    with open(BASELINE_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baseline(baseline: dict) -> None:
+    with open(BASELINE_PATH, "w", encoding="utf-8") as f:
+        json.dump(baseline, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--update-golden", action="store_true",
+                            help="перезаписать эталоны текущим выводом")
+    arg_parser.add_argument("--update-baseline", action="store_true",
+                            help="записать текущую скорость как baseline")
+    arg_parser.add_argument("--skip-throughput", action="store_true",
+                            help="только сравнение с эталонами")
+    args = arg_parser.parse_args(argv)
+
+    corpus = load_corpus()
+    baseline = load_baseline()
+    failures = []
+
+    for name, statement in corpus.items():
+        error = check_golden(name, render(statement), args.update_golden)
+        if error:
+            failures.append(error)
+
+        error = check_golden(name, render_quarantine(name, statement), args.update_golden,
+                             extension="quarantine.jsonl", optional=True)
+        if error:
+            failures.append(error)
+
+        if statement.get("fixes"):
+            error = check_reparse(name, statement)
+            if error:
+                failures.append(error)
+
+    error = check_golden("merged", render_merged(corpus), args.update_golden)
+    if error:
+        failures.append(error)
+
+    if not args.skip_throughput:
+        max_slowdown = baseline["max_slowdown_percent"]
+        workloads = [
+            (name, lambda statement=statement: render(statement), count_rows(statement))
+            for name, statement in corpus.items()
+            if not statement.get("faulty")
+        ]
+        workloads.append((
+            "merged",
+            lambda: render_merged(corpus),
+            sum(rows for _, _, rows in workloads),
+        ))
+        for name, work, rows in workloads:
+            rows_per_sec, relative = measure_relative_throughput(
+                work, rows, baseline["repeat"], baseline["rounds"]
+            )
+            expected = baseline["relative_throughput"].get(name)
+            print(f"{name}: {rows_per_sec:,.0f} строк/сек, относительно калибровки "
+                  f"{relative:.3f} (baseline: {expected or '-'})")
+
+            if args.update_baseline:
+                baseline["relative_throughput"][name] = round(relative, 3)
+            elif expected and relative < expected * (1 - max_slowdown / 100):
+                failures.append(
+                    f"{name}: относительная скорость {relative:.3f} - ниже baseline {expected} "
+                    f"более чем на {max_slowdown}%"
+                )
+
+        if args.update_baseline:
+            save_baseline(baseline)
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if failures:
+        return 1
+    print(f"OK: {len(corpus)} выписок и их слияние совпали с эталонами")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
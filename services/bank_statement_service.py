@@ -1,12 +1,20 @@
 # services/bank_statement_service.py
 
-from typing import Optional
+import copy
+import itertools
+import logging
+from typing import Iterator, List, Optional, Sequence, TextIO, Tuple
 from onik.project.parsers.base_parser import BaseBankStatementParser
+from onik.project.parsers.contragent_resolver import ContragentResolver, default_contragent_resolver
+from onik.project.parsers.quarantine import Quarantine
 from onik.project.parsers.privatbank_pdf_parser import PrivatBankPdfParser
 from onik.project.generators.iiko_1c_file_generator import Iiko1CFileGenerator
 from onik.project.models.transaction import Transaction
+from onik.project.services.transaction_sorter import iter_sorted_by_date
 import os
 
+logger = logging.getLogger(__name__)
+
 
 class BankStatementService:
     """
@@ -16,7 +24,12 @@ class BankStatementService:
     3) Генерирует выходной текст.
     """
 
-    def __init__(self):
+    def __init__(self, contragent_resolver: Optional[ContragentResolver] = None):
+        # Кэш контрагентов, общий с зарегистрированными парсерами:
+        # после обработки выписок его индекс сохраняется на диск,
+        # а статистика попаданий пишется в лог
+        self.contragent_resolver = contragent_resolver or default_contragent_resolver
+
         # Можно хранить доступные парсеры в виде словаря
         # или использовать фабрику.
         self.parsers_map = {
@@ -33,18 +46,141 @@ class BankStatementService:
         """
         self.parsers_map[key] = parser
 
-    def process_file(self, file_path: str, parser_key: str) -> str:
+    def process_file(
+        self,
+        file_path: str,
+        parser_key: str,
+        quarantine_path: Optional[str] = None
+    ) -> str:
         """
         Высокоуровневая функция, которую вызываем из кода бота/веб-сервиса/CLI:
           1) Находит нужный парсер по ключу.
           2) Парсит файл -> список Transaction.
           3) Генерирует текст в формате 1CClientBankExchange.
           4) Возвращает этот текст, чтобы можно было сохранить/отправить.
+        Строки/страницы с ошибками пишутся в sidecar-файл карантина
+        (по умолчанию "<файл>.quarantine.jsonl").
         """
         if parser_key not in self.parsers_map:
             raise ValueError(f"Не найден парсер с ключом '{parser_key}'")
 
-        parser = self.parsers_map[parser_key]
-        transactions = parser.parse(file_path)
+        transactions = self._parse_with_quarantine(file_path, parser_key, quarantine_path)
+        self._flush_contragent_cache()
 
         return self.file_generator.generate_file_content(transactions)
+
+    def process_files(
+        self,
+        files: Sequence[Tuple[str, str]],
+        output: TextIO,
+        sort_chunk_size: int = 10000
+    ) -> int:
+        """
+        Объединяет выписки любого количества банков в один файл для iiko:
+          1) Парсит каждый файл своим парсером (пары (путь, ключ парсера))
+             потоком - через iter_transactions.
+          2) Упорядочивает транзакции каждой выписки по дате; больше
+             `sort_chunk_size` транзакций сортируются через временные файлы.
+          3) Сливает их генератором в один файл с одной шапкой и "КонецФайла".
+        Ошибки каждой выписки - в её sidecar-файл карантина.
+        Возвращает количество записанных документов.
+        """
+        for _, parser_key in files:
+            if parser_key not in self.parsers_map:
+                raise ValueError(f"Не найден парсер с ключом '{parser_key}'")
+
+        streams = [
+            self._open_sorted_stream(file_path, parser_key, sort_chunk_size)
+            for file_path, parser_key in files
+        ]
+        count = self.file_generator.write_merged_file(streams, output)
+        self._flush_contragent_cache()
+        return count
+
+    def reparse_quarantined(
+        self,
+        file_path: str,
+        parser_key: str,
+        quarantine_path: Optional[str] = None
+    ) -> str:
+        """
+        Повторный разбор после исправления парсера:
+          1) Читает sidecar-файл карантина выписки.
+          2) Перепарсивает только попавшие туда страницы/строки.
+          3) Перезаписывает sidecar оставшимися ошибками (или удаляет его).
+          4) Возвращает текст 1CClientBankExchange только по восстановленным строкам.
+        """
+        if parser_key not in self.parsers_map:
+            raise ValueError(f"Не найден парсер с ключом '{parser_key}'")
+
+        quarantine_path = quarantine_path or Quarantine.sidecar_path(file_path)
+        if not os.path.exists(quarantine_path):
+            raise FileNotFoundError(
+                f"Не найден файл карантина '{quarantine_path}' для выписки '{file_path}'"
+            )
+
+        # Sidecar относится к одной выписке - берём все его записи
+        selection = Quarantine.load(quarantine_path).selection()
+        if not selection:
+            # Перепарсивать нечего - sidecar не трогаем
+            return self.file_generator.generate_file_content([])
+
+        quarantine = Quarantine()
+        transactions = self.parsers_map[parser_key].parse(
+            file_path, quarantine=quarantine, selection=selection
+        )
+        quarantine.write(quarantine_path)
+        self._flush_contragent_cache()
+
+        return self.file_generator.generate_file_content(transactions)
+
+    def _parse_with_quarantine(
+        self,
+        file_path: str,
+        parser_key: str,
+        quarantine_path: Optional[str] = None
+    ) -> List[Transaction]:
+        quarantine = Quarantine()
+        transactions = self.parsers_map[parser_key].parse(file_path, quarantine=quarantine)
+        quarantine.write(quarantine_path or Quarantine.sidecar_path(file_path))
+        return transactions
+
+    def _open_sorted_stream(
+        self,
+        file_path: str,
+        parser_key: str,
+        sort_chunk_size: int
+    ) -> Tuple[str, Iterator[Transaction]]:
+        """
+        Возвращает (наш счёт из шапки, транзакции выписки по дате).
+        Шапка читается при первом обращении к потоку, поэтому первую
+        транзакцию берём сразу - её всё равно первой запросит слияние.
+        """
+        # Потоки читаются вперемешку, поэтому каждому - своя копия парсера
+        # (у парсера есть состояние: реквизиты нашей компании из шапки)
+        parser = copy.copy(self.parsers_map[parser_key])
+        stream = iter_sorted_by_date(self._iter_with_quarantine(parser, file_path), sort_chunk_size)
+        first = next(stream, None)
+        account = parser.our_company_account or ""
+        if first is None:
+            return account, stream
+        return account, itertools.chain([first], stream)
+
+    def _iter_with_quarantine(self, parser: BaseBankStatementParser, file_path: str) -> Iterator[Transaction]:
+        quarantine = Quarantine()
+        yield from parser.iter_transactions(file_path, quarantine=quarantine)
+        quarantine.write(Quarantine.sidecar_path(file_path))
+
+    def _contragent_resolvers(self) -> List[ContragentResolver]:
+        """Кэш сервиса и кэши зарегистрированных парсеров (без повторов)."""
+        resolvers = [self.contragent_resolver]
+        for parser in self.parsers_map.values():
+            resolver = getattr(parser, "resolver", None)
+            if resolver is not None and all(resolver is not r for r in resolvers):
+                resolvers.append(resolver)
+        return resolvers
+
+    def _flush_contragent_cache(self) -> None:
+        for resolver in self._contragent_resolvers():
+            resolver.save_index()
+            logger.info("Кэш контрагентов: %s", resolver.stats())
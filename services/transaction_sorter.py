@@ -0,0 +1,74 @@
+# services/transaction_sorter.py
+
+import heapq
+import pickle
+import tempfile
+from itertools import islice
+from typing import BinaryIO, Iterable, Iterator, List, Tuple
+
+from onik.project.models.transaction import Transaction
+
+# Транзакция с порядковым номером: при равных датах сохраняем порядок выписки
+_Keyed = Tuple[object, int, Transaction]
+
+
+def iter_sorted_by_date(
+    transactions: Iterable[Transaction],
+    chunk_size: int = 10000
+) -> Iterator[Transaction]:
+    """
+    Упорядочивает поток транзакций по дате, не держа его целиком в памяти:
+      1) Читает поток кусками по `chunk_size`, каждый кусок сортирует.
+      2) Если кусок один - отдаёт его сразу, без диска.
+      3) Иначе сбрасывает куски во временные файлы и сливает их кучей,
+         читая из каждого по одной транзакции.
+    Сортировка устойчивая - как sorted(..., key=lambda t: t.date).
+    """
+    if chunk_size < 1:
+        raise ValueError(f"Размер куска сортировки должен быть не меньше 1, получено {chunk_size}")
+    return _iter_sorted(transactions, chunk_size)
+
+
+def _iter_sorted(transactions: Iterable[Transaction], chunk_size: int) -> Iterator[Transaction]:
+    iterator = enumerate(transactions)
+    first_chunk = _read_chunk(iterator, chunk_size)
+    if len(first_chunk) < chunk_size:
+        for _, _, t in first_chunk:
+            yield t
+        return
+
+    spill_files: List[BinaryIO] = []
+    try:
+        chunk = first_chunk
+        while chunk:
+            spill_files.append(_spill(chunk))
+            chunk = _read_chunk(iterator, chunk_size)
+
+        merged = heapq.merge(*(_read_spill(f) for f in spill_files), key=lambda item: item[:2])
+        for _, _, t in merged:
+            yield t
+    finally:
+        for f in spill_files:
+            f.close()
+
+
+def _read_chunk(iterator: Iterator[Tuple[int, Transaction]], chunk_size: int) -> List[_Keyed]:
+    chunk = [(t.date, seq, t) for seq, t in islice(iterator, chunk_size)]
+    chunk.sort(key=lambda item: item[:2])
+    return chunk
+
+
+def _spill(chunk: List[_Keyed]) -> BinaryIO:
+    f = tempfile.TemporaryFile()
+    for item in chunk:
+        pickle.dump(item, f, protocol=pickle.HIGHEST_PROTOCOL)
+    f.seek(0)
+    return f
+
+
+def _read_spill(f: BinaryIO) -> Iterator[_Keyed]:
+    while True:
+        try:
+            yield pickle.load(f)
+        except EOFError:
+            return